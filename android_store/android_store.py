@@ -83,7 +83,7 @@ class FDroidInterface(ServiceInterface):
     def _reset_idle_timer(self):
         """Reset the idle timer when activity occurs"""
         if self.idle_callback:
-            asyncio.create_task(self.idle_callback())
+            self.idle_callback()
 
     async def _process_task_queue(self):
         """Process tasks in queue one at a time"""
@@ -24,7 +24,8 @@ async def download_file(session, url, output_path):
                 return False
 
             # Download the file
-            with open(output_path, 'wb') as f:
+            # Large buffer so 64 KiB network chunks coalesce into few write() calls
+            with open(output_path, 'wb', buffering=1 << 20) as f:
                 total = int(response.headers.get('content-length', 0))
                 downloaded = 0
                 chunk_size = 65536
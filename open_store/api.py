@@ -2,7 +2,7 @@
 # Copyright (C) 2025 Bardia Moshiri <bardia@furilabs.com>
 
 import aiohttp
-import json
+import msgspec
 from loguru import logger
 
 OPENSTORE_API_URL = "https://open-store.io/api/v4/apps"
@@ -29,7 +29,7 @@ async def fetch_app_list(session):
                     logger.error(f"Error fetching apps: HTTP {response.status}")
                     break
 
-                data = await response.json()
+                data = msgspec.json.decode(await response.read())
 
                 packages = data.get('data', {}).get('packages', [])
                 page_count += 1
@@ -52,32 +52,41 @@ async def fetch_app_list(session):
     logger.info(f"Fetched {len(apps)} apps in {page_count} pages")
     return apps
 
-async def get_app_details(session, app_id):
+# Returned by fetch_app_details when the cached copy is still current
+NOT_MODIFIED = object()
+
+async def fetch_app_details(session, app_id, etag=None):
     """
-    Get detailed information about an app.
+    Fetch detailed information about an app, revalidating a cached copy.
 
     Args:
         session: aiohttp ClientSession
         app_id: App ID
+        etag: ETag of a cached copy of the details, if any
 
     Returns:
-        App details or None if not found
+        Tuple of (details, etag). details is NOT_MODIFIED if the copy tagged
+        etag is still current and None if the app could not be fetched.
     """
     url = f"{OPENSTORE_API_URL}/{app_id}"
+    headers = {'If-None-Match': etag} if etag else None
 
     try:
         logger.info(f"Fetching app details for {app_id}")
-        async with session.get(url) as response:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and etag:
+                return NOT_MODIFIED, etag
+
             if response.status != 200:
                 logger.error(f"Error fetching app details: HTTP {response.status}")
-                return None
+                return None, None
 
-            data = await response.json()
+            data = msgspec.json.decode(await response.read())
             if not data.get('success'):
                 logger.error(f"API returned error: {data.get('message')}")
-                return None
+                return None, None
 
-            return data.get('data')
+            return data.get('data'), response.headers.get('ETag')
     except Exception as e:
         logger.error(f"Error fetching app details: {e}")
-        return None
+        return None, None
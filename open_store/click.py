@@ -2,61 +2,241 @@
 # Copyright (C) 2025 Bardia Moshiri <bardia@furilabs.com>
 
 from pathlib import Path
-import subprocess
-import tempfile
 import platform
 import tarfile
+import queue
+import io
 import asyncio
 import shlex
-import glob
-import stat
 import os
 from loguru import logger
 
-async def extract_click_package(click_path, target_dir):
+STORE_APPS_DIR = os.path.expanduser("~/.local/store-provider/open-store/applications")
+SYSTEM_APPS_DIR = os.path.expanduser("~/.local/share/applications")
+SCRIPTS_DIR = os.path.expanduser("~/.local/store-provider/open-store/scripts")
+SCRIPT_MODE = 0o755
+
+def ensure_desktop_dirs():
+    """
+    Create the directories desktop files and wrapper scripts are written to.
+
+    Called on every install, so directories removed meanwhile are recreated.
+    """
+    for directory in (STORE_APPS_DIR, SYSTEM_APPS_DIR, SCRIPTS_DIR):
+        Path(directory).mkdir(parents=True, exist_ok=True)
+
+def _iter_desktop_files(root):
+    """
+    Walk a directory tree and yield the paths of desktop files in it.
+
+    Hidden entries are skipped and symlinked directories are not followed.
+
+    Args:
+        root: Directory to search
+
+    Yields:
+        Paths to .desktop files
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith('.desktop'):
+                        yield entry.path
+        except OSError as e:
+            logger.error(f"Error scanning {directory}: {e}")
+
+AR_MAGIC = b"!<arch>\n"
+AR_HEADER_SIZE = 60
+TAR_COPY_BUFSIZE = 2 * 1024 * 1024
+# Network chunks buffered between a download and its extraction thread
+STREAM_QUEUE_CHUNKS = 32
+
+class ArMemberReader(io.RawIOBase):
+    """
+    Read-only view limited to a single member of an ar archive.
+    """
+    def __init__(self, fileobj, size):
+        super().__init__()
+        self.fileobj = fileobj
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+
+        view = memoryview(buffer)[:self.remaining]
+        count = self.fileobj.readinto(view)
+        self.remaining -= count
+        return count
+
+def find_ar_member(fileobj, prefix):
+    """
+    Advance an ar archive stream to the first member whose name starts with prefix.
+
+    Args:
+        fileobj: Binary file object positioned at the start of the archive
+        prefix: Member name prefix to look for
+
+    Returns:
+        Tuple of (member name, member size) or None if no member matched
+    """
+    if fileobj.read(len(AR_MAGIC)) != AR_MAGIC:
+        raise ValueError("Not an ar archive")
+
+    while True:
+        header = fileobj.read(AR_HEADER_SIZE)
+        if len(header) < AR_HEADER_SIZE:
+            return None
+        if header[58:60] != b"`\n":
+            raise ValueError("Corrupt ar member header")
+
+        # GNU ar terminates member names with a slash
+        name = header[0:16].decode('ascii').rstrip().rstrip('/')
+        size = int(header[48:58].decode('ascii'))
+
+        if name.startswith(prefix):
+            return name, size
+
+        # Member data is padded to an even offset
+        skip = size + (size & 1)
+        while skip > 0:
+            chunk = fileobj.read(min(skip, 65536))
+            if not chunk:
+                return None
+            skip -= len(chunk)
+
+class ChunkQueueReader(io.RawIOBase):
+    """
+    Read-only stream over byte chunks handed over through a queue.
+
+    A None chunk marks the end of the stream.
+    """
+    def __init__(self, chunks):
+        super().__init__()
+        self.chunks = chunks
+        # View into the current chunk, so reads slice it without copying
+        self.pending = memoryview(b"")
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            if self.eof:
+                return 0
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.eof = True
+            else:
+                self.pending = memoryview(chunk)
+
+        count = min(len(buffer), len(self.pending))
+        buffer[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        return count
+
+def _extract_click_fileobj(fileobj, target_dir, source):
     """
-    Extract a click package to the target directory.
+    Extract the data tarball of a click package read from a binary stream.
+
+    The data tarball is streamed straight out of the ar container, so the
+    other members are never written to disk.
 
     Args:
-        click_path: Path to the .click file
+        fileobj: Binary file object positioned at the start of the package
         target_dir: Directory to extract contents to
+        source: Description of the package for log messages
 
     Returns:
         Path to the extracted directory or None if extraction failed
     """
     os.makedirs(target_dir, exist_ok=True)
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            logger.info(f"Extracting click package: {click_path}")
-            subprocess.run(['ar', 'x', click_path], cwd=temp_dir, check=True)
-
-            data_tar_path = os.path.join(temp_dir, 'data.tar.gz')
-            if os.path.exists(data_tar_path):
-                with tarfile.open(data_tar_path) as tar:
-                    tar.extractall(path=target_dir)
-
-                cleanup_files = ['_click-binary', 'control.tar.gz', 'debian-binary']
-                for file_name in cleanup_files:
-                    file_path = os.path.join(temp_dir, file_name)
-                    if os.path.exists(file_path):
-                        try:
-                            os.remove(file_path)
-                        except Exception as e:
-                            logger.error(f"Error removing {file_path}: {e}")
-
-                logger.info(f"Extracted to {target_dir}")
-                return target_dir
-            else:
-                logger.warning(f"data.tar.gz not found in {click_path}")
-                return None
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Error extracting click package: {e}")
-            return None
-        except tarfile.TarError as e:
-            logger.error(f"Error extracting data tarball: {e}")
+    try:
+        member = find_ar_member(fileobj, 'data.tar')
+        if not member:
+            logger.warning(f"data.tar.gz not found in {source}")
             return None
 
+        data_tar = io.BufferedReader(ArMemberReader(fileobj, member[1]))
+        with tarfile.open(fileobj=data_tar, mode='r|*', copybufsize=TAR_COPY_BUFSIZE) as tar:
+            if hasattr(tarfile, 'tar_filter'):
+                tar.extractall(path=target_dir, filter='tar')
+            else:
+                tar.extractall(path=target_dir)
+
+        logger.info(f"Extracted to {target_dir}")
+        return target_dir
+    except (OSError, ValueError) as e:
+        logger.error(f"Error extracting click package: {e}")
+        return None
+    except tarfile.TarError as e:
+        logger.error(f"Error extracting data tarball: {e}")
+        return None
+
+def _extract_click_queue(chunks, target_dir, source):
+    """Blocking consumer side of extract_click_stream"""
+    reader = ChunkQueueReader(chunks)
+    try:
+        return _extract_click_fileobj(io.BufferedReader(reader), target_dir, source)
+    finally:
+        # Unblock the producer if extraction stopped before the end of the stream
+        reader.eof = True
+        try:
+            while True:
+                chunks.get_nowait()
+        except queue.Empty:
+            pass
+
+async def extract_click_stream(chunks, target_dir, source, executor=None):
+    """
+    Extract a click package while it is being downloaded.
+
+    The chunks are handed to a worker thread that unpacks them as they
+    arrive, so the package itself is never written to disk.
+
+    Args:
+        chunks: Async iterator of the package bytes, e.g. an HTTP response body
+        target_dir: Directory to extract contents to
+        source: Description of the package for log messages
+        executor: Executor to extract in, the loop's default one if None
+
+    Returns:
+        Path to the extracted directory or None if extraction failed
+    """
+    logger.info(f"Extracting click package: {source}")
+    pending = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    extract = asyncio.get_running_loop().run_in_executor(
+        executor, _extract_click_queue, pending, target_dir, source
+    )
+
+    try:
+        async for chunk in chunks:
+            if extract.done():
+                break
+            try:
+                pending.put_nowait(chunk)
+            except queue.Full:
+                # Extraction is behind the network, wait for room
+                await asyncio.to_thread(pending.put, chunk)
+    finally:
+        if not extract.done():
+            await asyncio.to_thread(pending.put, None)
+        result = await extract
+
+    return result
+
 def get_system_architecture():
     """
     Get the current system architecture and map it to OpenStore architecture names.
@@ -71,95 +251,68 @@ def get_system_architecture():
     }
     return arch_mapping.get(platform.machine(), 'all')
 
-def find_compatible_download(downloads, system_arch, prefer_focal=True):
+def add_revisions(downloads):
     """
-    Find the best download option based on architecture and channel preferences.
+    Parse the revision of each download once, storing it as an int under '_rev'.
+    Missing or invalid revisions are stored as 0.
 
     Args:
-        downloads: List of download options
-        system_arch: Current system architecture
-        prefer_focal: Whether to prefer focal channel
-
-    Returns:
-        Best matching download or None if no match found
+        downloads: List of download options, updated in place
     """
-    if prefer_focal:
-        for download in downloads:
-            if (download.get('channel') == 'focal' and
-                (download.get('architecture') == system_arch or download.get('architecture') == 'all')):
-                return download
-
     for download in downloads:
-        if download.get('architecture') == system_arch or download.get('architecture') == 'all':
-            return download
-
-    return None
+        try:
+            download['_rev'] = int(download.get('revision') or 0)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid revision in download: {download.get('revision')!r}")
+            download['_rev'] = 0
 
-async def download_file(session, url, output_path):
+def find_latest_download(downloads, architecture, channel):
     """
-    Download a file from a URL to the specified path.
+    Find the newest download for an architecture in a single pass.
+
+    Builds from the given channel are preferred, then focal builds, then any
+    other compatible build. Within that, the highest revision wins.
 
     Args:
-        session: aiohttp ClientSession
-        url: URL to download from
-        output_path: Path to save the file
+        downloads: List of download options, passed through add_revisions
+        architecture: Architecture the app is installed for
+        channel: Channel the app is installed from
 
     Returns:
-        True if download was successful, False otherwise
+        Newest matching download or None if no match found
     """
-    try:
-        async with session.get(url) as response:
-            if response.status != 200:
-                logger.error(f"Error downloading file: HTTP {response.status}")
-                return False
-
-            # Download the file
-            with open(output_path, 'wb') as f:
-                total = int(response.headers.get('content-length', 0))
-                downloaded = 0
-                chunk_size = 65536
-
-                async for chunk in response.content.iter_chunked(chunk_size):
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total > 0:
-                        progress = int(downloaded * 100 / total)
-                        logger.info(f"Download progress: {progress}%")
-            return True
-    except Exception as e:
-        logger.error(f"Error downloading file: {e}")
-        if os.path.exists(output_path):
-            os.remove(output_path)
-        return False
+    # Highest (revision, download) so far for each preference rank
+    best = [None, None, None]
 
-async def process_desktop_files(app_id, app_dir):
-    """
-    Process desktop files in the extracted click package.
+    for download in downloads:
+        if download.get('architecture') not in (architecture, 'all'):
+            continue
 
-    For each desktop file found:
-    1. Read and parse the content
-    2. Create a wrapper script to set up environment variables
-    3. Create a modified version with absolute paths in ~/.local/store-provider/open-store/applications/
-    4. Create a symlink to ~/.local/share/applications/
+        download_channel = download.get('channel')
+        if download_channel == channel:
+            rank = 0
+        elif download_channel == 'focal':
+            rank = 1
+        else:
+            rank = 2
 
-    Args:
-        app_id: App ID
-        app_dir: Path to the extracted app directory
+        revision = download.get('_rev', 0)
+        if best[rank] is None or revision > best[rank][0]:
+            best[rank] = (revision, download)
 
-    Returns:
-        List of created desktop files and symlinks
-    """
-    results = []
+    for candidate in best:
+        if candidate is not None:
+            return candidate[1]
+
+    return None
 
-    store_apps_dir = os.path.expanduser("~/.local/store-provider/open-store/applications")
-    system_apps_dir = os.path.expanduser("~/.local/share/applications")
-    scripts_dir = os.path.expanduser("~/.local/store-provider/open-store/scripts")
+def _process_desktop_files_sync(app_id, app_dir):
+    """Blocking implementation of process_desktop_files"""
+    results = []
 
-    os.makedirs(store_apps_dir, exist_ok=True)
-    os.makedirs(system_apps_dir, exist_ok=True)
-    os.makedirs(scripts_dir, exist_ok=True)
+    ensure_desktop_dirs()
 
-    desktop_files = glob.glob(os.path.join(app_dir, "**/*.desktop"), recursive=True)
+    desktop_files = list(_iter_desktop_files(app_dir))
 
     if not desktop_files:
         logger.warning(f"No desktop files found for {app_id}")
@@ -189,27 +342,31 @@ async def process_desktop_files(app_id, app_dir):
 
             desktop_filename = os.path.basename(desktop_file)
             script_basename = f"{app_id}_{os.path.splitext(desktop_filename)[0]}"
-            script_path = os.path.join(scripts_dir, f"{script_basename}.sh")
-            store_desktop_path = os.path.join(store_apps_dir, f"{app_id}_{desktop_filename}")
-            system_desktop_path = os.path.join(system_apps_dir, f"{app_id}_{desktop_filename}")
+            script_path = os.path.join(SCRIPTS_DIR, f"{script_basename}.sh")
+            store_desktop_path = os.path.join(STORE_APPS_DIR, f"{app_id}_{desktop_filename}")
+            system_desktop_path = os.path.join(SYSTEM_APPS_DIR, f"{app_id}_{desktop_filename}")
 
             entry = desktop_content['Desktop Entry']
             name = entry.get('Name', app_id)
             exec_cmd = entry.get('Exec', '')
             icon = entry.get('Icon', '')
 
-            with open(script_path, 'w') as f:
-                f.write("#!/bin/bash\n\n")
-                f.write("# Script generated by OpenStore to launch app with the right enrionment variables\n\n")
-                f.write("TRIPLET=$(awk 'BEGIN{FS=\"[ ()-]\"; \"bash --version\"|getline; OFS=\"-\"; if (/bash/) print $9,$11,$12}')\n\n")
-                f.write(f"cd {app_dir}\n\n")
-                f.write("export LD_LIBRARY_PATH=${PWD}/../lib:${PWD}/lib:${PWD}/usr/lib:${PWD}/lib/${TRIPLET}:${PWD}/usr/lib/${TRIPLET}:/usr/lib/${TRIPLET}/furios-lomiri-app-support/lib:${LD_LIBRARY_PATH}\n\n")
-                f.write("export PATH=${PWD}:${PWD}/../bin:${PWD}/bin:${PWD}/usr/bin:${PWD}/lib/bin:${PWD}/lib/${TRIPLET}/bin:/usr/lib/${TRIPLET}/furios-lomiri-app-support/bin:${PATH}\n\n")
-                f.write("export QML2_IMPORT_PATH=${PWD}/lib:${PWD}/lib/${TRIPLET}:${PWD}/usr/lib/:${PWD}/usr/lib/${TRIPLET}/\n\n")
-                f.write("export XDG_CACHE_HOME=$HOME/.cache/\n\n")
-                f.write(f"{exec_cmd}\n")
-
-            os.chmod(script_path, os.stat(script_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+            script = (
+                "#!/bin/bash\n\n"
+                "# Script generated by OpenStore to launch app with the right enrionment variables\n\n"
+                "TRIPLET=$(awk 'BEGIN{FS=\"[ ()-]\"; \"bash --version\"|getline; OFS=\"-\"; if (/bash/) print $9,$11,$12}')\n\n"
+                f"cd {app_dir}\n\n"
+                "export LD_LIBRARY_PATH=${PWD}/../lib:${PWD}/lib:${PWD}/usr/lib:${PWD}/lib/${TRIPLET}:${PWD}/usr/lib/${TRIPLET}:/usr/lib/${TRIPLET}/furios-lomiri-app-support/lib:${LD_LIBRARY_PATH}\n\n"
+                "export PATH=${PWD}:${PWD}/../bin:${PWD}/bin:${PWD}/usr/bin:${PWD}/lib/bin:${PWD}/lib/${TRIPLET}/bin:/usr/lib/${TRIPLET}/furios-lomiri-app-support/bin:${PATH}\n\n"
+                "export QML2_IMPORT_PATH=${PWD}/lib:${PWD}/lib/${TRIPLET}:${PWD}/usr/lib/:${PWD}/usr/lib/${TRIPLET}/\n\n"
+                "export XDG_CACHE_HOME=$HOME/.cache/\n\n"
+                f"{exec_cmd}\n"
+            )
+
+            # Create the script executable instead of chmod'ing it afterwards
+            fd = os.open(script_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, SCRIPT_MODE)
+            with os.fdopen(fd, 'w') as f:
+                f.write(script)
 
             entry['Path'] = app_dir
             entry['Exec'] = script_path
@@ -219,12 +376,16 @@ async def process_desktop_files(app_id, app_dir):
                 if os.path.exists(icon_path):
                     entry['Icon'] = icon_path
 
-            with open(store_desktop_path, 'w') as f:
-                for section, keys in desktop_content.items():
-                    f.write(f"[{section}]\n")
-                    for key, value in keys.items():
-                        f.write(f"{key}={value}\n")
-                    f.write("\n")
+            desktop_data = ''.join(
+                f"[{section}]\n" + ''.join(f"{key}={value}\n" for key, value in keys.items()) + "\n"
+                for section, keys in desktop_content.items()
+            )
+
+            # Write next to the target and rename so launchers never see a partial file
+            temp_desktop_path = f"{store_desktop_path}.tmp"
+            with open(temp_desktop_path, 'w') as f:
+                f.write(desktop_data)
+            os.replace(temp_desktop_path, store_desktop_path)
 
             if os.path.exists(system_desktop_path):
                 os.remove(system_desktop_path)
@@ -241,29 +402,18 @@ async def process_desktop_files(app_id, app_dir):
             logger.error(f"Error processing desktop file {desktop_file}: {e}")
     return results
 
-async def cleanup_desktop_files(app_id):
-    """
-    Clean up desktop files and symlinks for an app.
-
-    Args:
-        app_id: App ID
-
-    Returns:
-        True if successful, False otherwise
-    """
-
+def _scan_app_files(directory, prefix, suffix):
+    """List the entries of a directory that belong to an app"""
+    try:
+        with os.scandir(directory) as it:
+            return [entry.path for entry in it
+                    if entry.name.startswith(prefix) and entry.name.endswith(suffix)]
+    except FileNotFoundError:
+        return []
+
+def _cleanup_desktop_files_sync(app_id, store_desktop_files, system_desktop_files, script_files):
+    """Blocking implementation of cleanup_desktop_files"""
     try:
-        store_apps_dir = os.path.expanduser("~/.local/store-provider/open-store/applications")
-        system_apps_dir = os.path.expanduser("~/.local/share/applications")
-        scripts_dir = os.path.expanduser("~/.local/store-provider/open-store/scripts")
-
-        pattern = f"{app_id}_*.desktop"
-        script_pattern = f"{app_id}_*.sh"
-
-        store_desktop_files = glob.glob(os.path.join(store_apps_dir, pattern))
-        system_desktop_files = glob.glob(os.path.join(system_apps_dir, pattern))
-        script_files = glob.glob(os.path.join(scripts_dir, script_pattern))
-
         for desktop_file in system_desktop_files:
             if os.path.islink(desktop_file):
                 os.remove(desktop_file)
@@ -281,3 +431,49 @@ async def cleanup_desktop_files(app_id):
     except Exception as e:
         logger.error(f"Error cleaning up desktop files for {app_id}: {e}")
         return False
+
+async def process_desktop_files(app_id, app_dir):
+    """
+    Process desktop files in the extracted click package.
+
+    For each desktop file found:
+    1. Read and parse the content
+    2. Create a wrapper script to set up environment variables
+    3. Create a modified version with absolute paths in ~/.local/store-provider/open-store/applications/
+    4. Create a symlink to ~/.local/share/applications/
+
+    Args:
+        app_id: App ID
+        app_dir: Path to the extracted app directory
+
+    Returns:
+        List of created desktop files and symlinks
+    """
+    return await asyncio.to_thread(_process_desktop_files_sync, app_id, app_dir)
+
+async def cleanup_desktop_files(app_id):
+    """
+    Clean up desktop files and symlinks for an app.
+
+    Args:
+        app_id: App ID
+
+    Returns:
+        True if successful, False otherwise
+    """
+    prefix = f"{app_id}_"
+
+    try:
+        store_desktop_files, system_desktop_files, script_files = await asyncio.gather(
+            asyncio.to_thread(_scan_app_files, STORE_APPS_DIR, prefix, '.desktop'),
+            asyncio.to_thread(_scan_app_files, SYSTEM_APPS_DIR, prefix, '.desktop'),
+            asyncio.to_thread(_scan_app_files, SCRIPTS_DIR, prefix, '.sh')
+        )
+    except Exception as e:
+        logger.error(f"Error cleaning up desktop files for {app_id}: {e}")
+        return False
+
+    return await asyncio.to_thread(
+        _cleanup_desktop_files_sync, app_id,
+        store_desktop_files, system_desktop_files, script_files
+    )
@@ -1,11 +1,134 @@
 # SPDX-License-Identifier: GPL-2.0-only
 # Copyright (C) 2025 Bardia Moshiri <bardia@furilabs.com>
 
+from pathlib import Path
 import aiosqlite
-import json
+import asyncio
+import msgspec
 import os
 from loguru import logger
 
+json_enc = msgspec.json.Encoder()
+
+def dump_json(obj):
+    """Serialize an object to compact JSON text for a TEXT column"""
+    return json_enc.encode(obj).decode()
+
+# Size of sqlite3's per-connection prepared statement cache
+CACHED_STATEMENTS = 256
+
+# Stored in PRAGMA user_version once the schema is set up; bump when the DDL changes
+APP_SCHEMA_VERSION = 1
+INSTALLED_SCHEMA_VERSION = 1
+
+# Column order of the rows built by app_row(), from which the SQL is generated
+APP_COLUMNS = (
+    'id', 'name', 'tagline', 'description', 'author', 'license', 'icon',
+    'categories', 'architectures', 'publisher', 'types', 'framework',
+    'channels', 'latest_version', 'published_date', 'updated_date', 'web_url',
+    'data'
+)
+
+# Kept as constants so identical SQL text hits the statement cache
+INSERT_INSTALLED_SQL = """
+    INSERT OR REPLACE INTO installed_apps
+    (id, name, version, channel, architecture, install_date, app_dir)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+SELECT_INSTALLED_SQL = (
+    "SELECT id, name, version, channel, architecture, install_date, app_dir "
+    "FROM installed_apps WHERE id = ?"
+)
+SELECT_ALL_INSTALLED_SQL = (
+    "SELECT id, name, version, channel, architecture, install_date, app_dir "
+    "FROM installed_apps"
+)
+SELECT_INSTALLED_BY_IDS_SQL = (
+    "SELECT id, name, version, channel, architecture, install_date, app_dir "
+    "FROM installed_apps WHERE id IN ({placeholders})"
+)
+CURRENT_INSTALLED_SQL = (
+    "SELECT 1 FROM installed_apps WHERE id = ? AND version = ? "
+    "AND channel = ? AND architecture = ? AND app_dir = ?"
+)
+DELETE_INSTALLED_SQL = "DELETE FROM installed_apps WHERE id = ?"
+INSERT_APP_SQL = (
+    f"INSERT INTO apps ({', '.join(APP_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(APP_COLUMNS))})"
+)
+# Rows whose JSON is unchanged are left alone, so they are not rewritten
+UPSERT_APP_SQL = (
+    f"{INSERT_APP_SQL} ON CONFLICT(id) DO UPDATE SET "
+    + ', '.join(f"{column} = excluded.{column}" for column in APP_COLUMNS[1:])
+    + " WHERE apps.data IS NOT excluded.data"
+)
+# Best matches first; a hit in the name counts more than one in the tagline,
+# which counts more than one in the description (id is not indexed)
+SEARCH_SQL = """
+    SELECT a.id, a.name, a.tagline, a.license,
+        a.author, a.web_url, a.icon, a.latest_version
+    FROM apps_fts f
+    JOIN apps a ON a.rowid = f.rowid
+    WHERE apps_fts MATCH ?
+    ORDER BY bm25(apps_fts, 0.0, 10.0, 5.0, 1.0)
+"""
+# Fallback for queries without any word characters, which FTS5 cannot index.
+# Names starting with the query come first, then other substring matches.
+LIKE_SEARCH_SQL = """
+    SELECT id, name, tagline, license,
+        author, web_url, icon, latest_version
+    FROM apps
+    WHERE name LIKE ? ESCAPE '\\'
+    UNION ALL
+    SELECT id, name, tagline, license,
+        author, web_url, icon, latest_version
+    FROM apps
+    WHERE (name LIKE ? ESCAPE '\\' OR tagline LIKE ? ESCAPE '\\')
+        AND NOT name LIKE ? ESCAPE '\\'
+"""
+LIST_APPS_SQL = """
+    SELECT id, name, tagline, license,
+        author, web_url, icon, latest_version
+    FROM apps
+"""
+GET_APP_SQL = """
+    SELECT id, name, tagline, license,
+        author, web_url, icon, latest_version, description
+    FROM apps
+    WHERE id = ?
+"""
+
+async def configure_database(db):
+    """
+    Apply connection settings suited to the device's flash storage.
+
+    WAL makes synchronous=NORMAL safe, which drops an fsync from every
+    commit. The page cache and mmap window keep the read-heavy app
+    catalog in memory.
+
+    Args:
+        db: Database connection
+    """
+    async with db.execute("PRAGMA journal_mode = WAL") as cursor:
+        (journal_mode,) = await cursor.fetchone()
+
+    # synchronous=NORMAL is only crash-safe with a write-ahead log
+    if journal_mode.lower() == 'wal':
+        await db.execute("PRAGMA synchronous = NORMAL")
+    else:
+        logger.warning(f"Could not enable WAL (journal_mode={journal_mode}), keeping synchronous=FULL")
+
+    await db.executescript("""
+        PRAGMA temp_store = MEMORY;
+        PRAGMA mmap_size = 67108864;
+        PRAGMA cache_size = -8192;
+    """)
+
+async def get_schema_version(db):
+    """Read the schema version stored in the database header"""
+    rows = await db.execute_fetchall("PRAGMA user_version")
+    return rows[0][0]
+
 async def init_app_database(db_path):
     """
     Initialize the app database.
@@ -18,8 +141,13 @@ async def init_app_database(db_path):
     """
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
-    db = await aiosqlite.connect(db_path)
-    await db.execute("PRAGMA journal_mode = WAL")
+    db = await aiosqlite.connect(db_path, cached_statements=CACHED_STATEMENTS)
+    await configure_database(db)
+
+    # Schema is already current, so skip the DDL and migrations
+    if await get_schema_version(db) == APP_SCHEMA_VERSION:
+        logger.info("App database initialized")
+        return db
 
     await db.execute("""
         CREATE TABLE IF NOT EXISTS apps (
@@ -39,19 +167,159 @@ async def init_app_database(db_path):
             latest_version TEXT,
             published_date TEXT,
             updated_date TEXT,
+            web_url TEXT DEFAULT '',
             data JSON
         )
     """)
 
+    # Databases created before web_url was stored as its own column
+    async with db.execute("PRAGMA table_info(apps)") as cursor:
+        columns = [row[1] async for row in cursor]
+    if 'web_url' not in columns:
+        await db.execute("ALTER TABLE apps ADD COLUMN web_url TEXT DEFAULT ''")
+        # Fill the new column from the cached JSON so existing rows keep their URL
+        await db.execute(
+            "UPDATE apps SET web_url = COALESCE(json_extract(data, '$.web_url'), '')"
+        )
+
+    # LIKE is case-insensitive, so only a NOCASE index can serve prefix matches
+    await db.execute("DROP INDEX IF EXISTS idx_apps_name")
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_apps_name_nocase ON apps(name COLLATE NOCASE);
+    """)
+
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'apps_fts'"
+    ) as cursor:
+        fts_exists = await cursor.fetchone() is not None
+
+    # Full-text index over the searchable columns, kept in sync with apps by triggers
+    await db.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS apps_fts USING fts5(
+            id UNINDEXED, name, tagline, description,
+            content='apps', content_rowid='rowid',
+            tokenize='unicode61'
+        )
+    """)
+
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS apps_fts_insert AFTER INSERT ON apps BEGIN
+            INSERT INTO apps_fts(rowid, id, name, tagline, description)
+            VALUES (new.rowid, new.id, new.name, new.tagline, new.description);
+        END
+    """)
+
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS apps_fts_delete AFTER DELETE ON apps BEGIN
+            INSERT INTO apps_fts(apps_fts, rowid, id, name, tagline, description)
+            VALUES ('delete', old.rowid, old.id, old.name, old.tagline, old.description);
+        END
+    """)
+
     await db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_apps_name ON apps(name);
+        CREATE TRIGGER IF NOT EXISTS apps_fts_update AFTER UPDATE ON apps BEGIN
+            INSERT INTO apps_fts(apps_fts, rowid, id, name, tagline, description)
+            VALUES ('delete', old.rowid, old.id, old.name, old.tagline, old.description);
+            INSERT INTO apps_fts(rowid, id, name, tagline, description)
+            VALUES (new.rowid, new.id, new.name, new.tagline, new.description);
+        END
     """)
 
+    # Index apps that were cached before the full-text table existed
+    if not fts_exists:
+        await db.execute("INSERT INTO apps_fts(apps_fts) VALUES('rebuild')")
+
+    await db.execute(f"PRAGMA user_version = {APP_SCHEMA_VERSION}")
     await db.commit()
     logger.info("App database initialized")
 
     return db
 
+# Long-lived connections by database path, so each page cache stays warm
+_connections = {}
+
+async def get_app_db(db_path):
+    """
+    Get the shared app database connection, opening it on first use.
+
+    Args:
+        db_path: Path to the database file
+
+    Returns:
+        Database connection
+    """
+    db = _connections.get(db_path)
+    if db is None:
+        db = await init_app_database(db_path)
+
+        # Pull the catalog pages into the page cache before the first search
+        await db.execute_fetchall("SELECT COUNT(*) FROM apps")
+        _connections[db_path] = db
+
+    return db
+
+async def get_installed_db(db_path):
+    """
+    Get the shared installed apps database connection, opening it on first use.
+
+    Args:
+        db_path: Path to the database file
+
+    Returns:
+        Database connection
+    """
+    db = _connections.get(db_path)
+    if db is None:
+        db = await init_installed_database(db_path)
+        _connections[db_path] = db
+
+    return db
+
+async def close_db(db_path):
+    """
+    Close a shared database connection.
+
+    Args:
+        db_path: Path to the database file
+    """
+    db = _connections.pop(db_path, None)
+    if db is not None:
+        # Let SQLite refresh the query planner statistics it found stale
+        try:
+            await db.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.warning(f"Error optimizing database {db_path}: {e}")
+        await db.close()
+
+async def open_readers(db_path, n=2):
+    """
+    Open read-only connections to a database for concurrent queries.
+
+    With WAL, readers never block the writer or each other, so searches can
+    run while the catalog is being refreshed through the writer connection.
+
+    Args:
+        db_path: Path to the database file, which must already exist
+        n: Number of connections to open
+
+    Returns:
+        List of database connections
+    """
+    readers = []
+    uri = f"{Path(db_path).as_uri()}?mode=ro"
+
+    for _ in range(n):
+        db = await aiosqlite.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS)
+        await db.executescript("""
+            PRAGMA query_only = 1;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA mmap_size = 67108864;
+            PRAGMA cache_size = -8192;
+        """)
+        readers.append(db)
+
+    return readers
+
 async def init_installed_database(db_path):
     """
     Initialize the installed apps database.
@@ -64,8 +332,12 @@ async def init_installed_database(db_path):
     """
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
-    db = await aiosqlite.connect(db_path)
-    await db.execute("PRAGMA journal_mode = WAL")
+    db = await aiosqlite.connect(db_path, cached_statements=CACHED_STATEMENTS)
+    await configure_database(db)
+
+    if await get_schema_version(db) == INSTALLED_SCHEMA_VERSION:
+        logger.info("Installed apps database initialized")
+        return db
 
     await db.execute("""
         CREATE TABLE IF NOT EXISTS installed_apps (
@@ -79,11 +351,40 @@ async def init_installed_database(db_path):
         )
     """)
 
+    await db.execute(f"PRAGMA user_version = {INSTALLED_SCHEMA_VERSION}")
     await db.commit()
     logger.info("Installed apps database initialized")
 
     return db
 
+def app_row(app):
+    """Build an apps table row, in APP_COLUMNS order, from an app dictionary"""
+    g = app.get
+    return (
+        g('id', ''),
+        g('name', ''),
+        g('tagline', ''),
+        g('description', ''),
+        g('author', ''),
+        g('license', ''),
+        g('icon', ''),
+        dump_json(g('categories', [])),
+        dump_json(g('architectures', [])),
+        g('publisher', ''),
+        dump_json(g('types', [])),
+        g('framework', ''),
+        dump_json(g('channels', [])),
+        g('version', ''),
+        g('published_date', ''),
+        g('updated_date', ''),
+        g('web_url', ''),
+        dump_json(app)
+    )
+
+def app_rows(apps):
+    """Yield apps table rows, serialized one app at a time"""
+    return map(app_row, apps)
+
 async def save_app_list(db, apps):
     """
     Save a list of apps to the database.
@@ -96,44 +397,74 @@ async def save_app_list(db, apps):
         True if successful, False otherwise
     """
     try:
-        async with db.execute("BEGIN TRANSACTION;"):
-            await db.execute("DELETE FROM apps;")
-
-            for app in apps:
-                await db.execute("""
-                    INSERT INTO apps (
-                        id, name, tagline, description, author, license, icon,
-                        categories, architectures, publisher, types, framework,
-                        channels, latest_version, published_date, updated_date, data
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    app.get('id', ''),
-                    app.get('name', ''),
-                    app.get('tagline', ''),
-                    app.get('description', ''),
-                    app.get('author', ''),
-                    app.get('license', ''),
-                    app.get('icon', ''),
-                    json.dumps(app.get('architectures', [])),
-                    json.dumps(app.get('architectures', [])),
-                    app.get('publisher', ''),
-                    json.dumps(app.get('types', [])),
-                    app.get('framework', ''),
-                    json.dumps(app.get('channels', [])),
-                    app.get('version', ''),
-                    app.get('published_date', ''),
-                    app.get('updated_date', ''),
-                    json.dumps(app)
-                ))
-
-            await db.commit()
+        await db.execute("BEGIN IMMEDIATE")
+
+        # Remember which apps are still listed so only those are kept
+        await db.execute("CREATE TEMP TABLE IF NOT EXISTS _keep (id TEXT PRIMARY KEY)")
+        await db.executemany("INSERT OR IGNORE INTO _keep (id) VALUES (?)",
+                             ((app.get('id', ''),) for app in apps))
+
+        await db.executemany(UPSERT_APP_SQL, app_rows(apps))
+        await db.execute("DELETE FROM apps WHERE id NOT IN (SELECT id FROM _keep)")
+        await db.execute("DROP TABLE _keep")
+
+        await db.commit()
 
         logger.info(f"Saved {len(apps)} apps to database")
         return True
     except Exception as e:
         logger.error(f"Error saving apps to database: {e}")
+        await db.rollback()
         return False
 
+def fts_query(query):
+    """
+    Build an FTS5 prefix query from user input.
+
+    Every word becomes a quoted prefix term so characters that are part of
+    the FTS5 syntax (quotes, dashes, colons, ...) are matched literally, and
+    all words have to match somewhere in the app's name, tagline or
+    description, in any order.
+
+    Args:
+        query: Search query
+
+    Returns:
+        FTS5 MATCH expression
+    """
+    return ' '.join('"' + word.replace('"', '""') + '"*' for word in query.split())
+
+def escape_like(query):
+    """
+    Escape LIKE wildcards so user input is matched literally.
+
+    Args:
+        query: Search query
+
+    Returns:
+        Query with backslash, percent and underscore escaped by a backslash
+    """
+    return query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def app_info(row, description=''):
+    """Build the app dictionary returned to clients from a search row"""
+    app_id, name, tagline, license, author, web_url, icon, version = row
+
+    return {
+        'id': app_id,
+        'name': name,
+        'summary': tagline,  # Use tagline is somewhat a summary, looks to be enough
+        'description': description,
+        'license': license,
+        'author': author,
+        'web_url': web_url,
+        'repository': 'OpenStore',
+        'package': {
+            'version': version,
+            'icon_url': icon
+        }
+    }
+
 async def search_apps(db, query):
     """
     Search for apps in the database.
@@ -143,39 +474,23 @@ async def search_apps(db, query):
         query: Search query
 
     Returns:
-        List of matching apps
+        List of matching apps, with an empty description (see get_app)
     """
     results = []
 
     try:
-        search_query = f"%{query}%"
-        async with db.execute(
-            """
-            SELECT id, name, tagline, description, data
-            FROM apps
-            WHERE (name LIKE ? OR tagline LIKE ?)
-            """,
-            (search_query, search_query)
-        ) as cursor:
+        if any(char.isalnum() for char in query):
+            sql, params = SEARCH_SQL, (fts_query(query),)
+        elif query.strip():
+            escaped = escape_like(query.strip())
+            prefix, substring = f"{escaped}%", f"%{escaped}%"
+            sql, params = LIKE_SEARCH_SQL, (prefix, substring, substring, prefix)
+        else:
+            sql, params = LIST_APPS_SQL, ()
+
+        async with db.execute(sql, params) as cursor:
             async for row in cursor:
-                app_id, name, tagline, description, data = row
-                app_data = json.loads(data)
-
-                app_info = {
-                    'id': app_id,
-                    'name': name,
-                    'summary': tagline,  # Use tagline is somewhat a summary, looks to be enough
-                    'description': description,
-                    'license': app_data.get('license', ''),
-                    'author': app_data.get('author', ''),
-                    'web_url': app_data.get('web_url', ''),
-                    'repository': 'OpenStore',
-                    'package': {
-                        'version': app_data.get('version', ''),
-                        'icon_url': app_data.get('icon', '')
-                    }
-                }
-                results.append(app_info)
+                results.append(app_info(row))
 
         logger.info(f"Found {len(results)} apps matching '{query}'")
         return results
@@ -183,6 +498,35 @@ async def search_apps(db, query):
         logger.error(f"Error searching apps: {e}")
         return []
 
+async def get_app(db, app_id):
+    """
+    Get a single app from the database, including its description.
+
+    Args:
+        db: Database connection
+        app_id: App ID
+
+    Returns:
+        App information or None if not found
+    """
+    try:
+        rows = await db.execute_fetchall(GET_APP_SQL, (app_id,))
+        if not rows:
+            return None
+
+        *row, description = rows[0]
+        return app_info(row, description)
+    except Exception as e:
+        logger.error(f"Error getting app {app_id}: {e}")
+        return None
+
+async def _already_current(db, app_id, version, channel, architecture, app_dir):
+    """Check whether installed_apps already holds this exact install"""
+    rows = await db.execute_fetchall(CURRENT_INSTALLED_SQL, (
+        app_id, version, channel, architecture, app_dir
+    ))
+    return bool(rows)
+
 async def save_installed_app(db, app_id, name, version, channel, architecture,
                              install_date, app_dir):
     """
@@ -202,11 +546,12 @@ async def save_installed_app(db, app_id, name, version, channel, architecture,
         True if successful, False otherwise
     """
     try:
-        await db.execute("""
-            INSERT OR REPLACE INTO installed_apps
-            (id, name, version, channel, architecture, install_date, app_dir)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
+        # Reinstalls of the same build would otherwise rewrite and commit an identical row
+        if await _already_current(db, app_id, version, channel, architecture, app_dir):
+            logger.debug(f"Installed app {app_id} is already up to date in database")
+            return True
+
+        await db.execute(INSERT_INSTALLED_SQL, (
             app_id,
             name,
             version,
@@ -235,7 +580,7 @@ async def remove_installed_app(db, app_id):
         True if successful, False otherwise
     """
     try:
-        await db.execute("DELETE FROM installed_apps WHERE id = ?", (app_id,))
+        await db.execute(DELETE_INSTALLED_SQL, (app_id,))
         await db.commit()
 
         logger.info(f"Removed app {app_id} from database")
@@ -244,6 +589,10 @@ async def remove_installed_app(db, app_id):
         logger.error(f"Error removing app from database: {e}")
         return False
 
+def app_dir_exists(app_dir):
+    """Check whether an installed app's directory is still present"""
+    return os.path.exists(app_dir) if app_dir else False
+
 async def get_installed_apps(db):
     """
     Get list of installed apps from the database.
@@ -255,31 +604,38 @@ async def get_installed_apps(db):
         List of installed apps
     """
     installed_apps = []
+    missing_ids = []
 
     try:
-        async with db.execute(
-            "SELECT id, name, version, channel, architecture, install_date, app_dir FROM installed_apps"
-        ) as cursor:
-            async for row in cursor:
-                app_id, name, version, channel, architecture, install_date, app_dir = row
-
-                app_dir_exists = os.path.exists(app_dir) if app_dir else False
-
-                if app_dir_exists:
-                    app_info = {
-                        'id': app_id,
-                        'name': name,
-                        'version': version,
-                        'channel': channel,
-                        'architecture': architecture,
-                        'install_date': install_date,
-                        'app_dir': app_dir
-                    }
-                    installed_apps.append(app_info)
-                else:
-                    await db.execute("DELETE FROM installed_apps WHERE id = ?", (app_id,))
-                    await db.commit()
-                    logger.warning(f"Removed {app_id} from database as app directory is missing")
+        rows = await db.execute_fetchall(SELECT_ALL_INSTALLED_SQL)
+
+        # Stat all app directories concurrently, off the event loop
+        dirs_exist = await asyncio.gather(*(
+            asyncio.to_thread(app_dir_exists, row[6]) for row in rows
+        ))
+
+        for row, exists in zip(rows, dirs_exist):
+            app_id, name, version, channel, architecture, install_date, app_dir = row
+
+            if exists:
+                app_info = {
+                    'id': app_id,
+                    'name': name,
+                    'version': version,
+                    'channel': channel,
+                    'architecture': architecture,
+                    'install_date': install_date,
+                    'app_dir': app_dir
+                }
+                installed_apps.append(app_info)
+            else:
+                missing_ids.append(app_id)
+
+        # Only skipped here: this runs without the write lock, so a missing
+        # directory may just be an install swapping it. get_installed_app,
+        # called under the lock, drops rows that really are stale.
+        for app_id in missing_ids:
+            logger.warning(f"Skipping {app_id} as its app directory is missing")
 
         logger.info(f"Found {len(installed_apps)} installed apps")
         return installed_apps
@@ -299,34 +655,78 @@ async def get_installed_app(db, app_id):
         App information or None if not found
     """
     try:
-        async with db.execute(
-            "SELECT id, name, version, channel, architecture, install_date, app_dir FROM installed_apps WHERE id = ?",
-            (app_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
-
-            if row:
-                app_id, name, version, channel, architecture, install_date, app_dir = row
-
-                app_dir_exists = os.path.exists(app_dir) if app_dir else False
-
-                if app_dir_exists:
-                    app_info = {
-                        'id': app_id,
-                        'name': name,
-                        'version': version,
-                        'channel': channel,
-                        'architecture': architecture,
-                        'install_date': install_date,
-                        'app_dir': app_dir
-                    }
-                    return app_info
-                else:
-                    await db.execute("DELETE FROM installed_apps WHERE id = ?", (app_id,))
-                    await db.commit()
-                    logger.warning(f"Removed {app_id} from database as app directory is missing")
+        # One round trip to the worker thread instead of open/fetch/close
+        rows = await db.execute_fetchall(SELECT_INSTALLED_SQL, (app_id,))
 
-            return None
+        if rows:
+            app_id, name, version, channel, architecture, install_date, app_dir = rows[0]
+
+            app_dir_exists = os.path.exists(app_dir) if app_dir else False
+
+            if app_dir_exists:
+                app_info = {
+                    'id': app_id,
+                    'name': name,
+                    'version': version,
+                    'channel': channel,
+                    'architecture': architecture,
+                    'install_date': install_date,
+                    'app_dir': app_dir
+                }
+                return app_info
+            else:
+                await db.execute(DELETE_INSTALLED_SQL, (app_id,))
+                await db.commit()
+                logger.warning(f"Removed {app_id} from database as app directory is missing")
+
+        return None
     except Exception as e:
         logger.error(f"Error getting installed app: {e}")
         return None
+
+async def get_installed_apps_by_ids(db, app_ids):
+    """
+    Get information about several installed apps in one query.
+
+    Args:
+        db: Database connection
+        app_ids: App IDs
+
+    Returns:
+        Dictionary of app information by app ID, for the apps that are
+        installed and whose app directory still exists
+    """
+    installed_apps = {}
+    app_ids = list(app_ids)
+    if not app_ids:
+        return installed_apps
+
+    try:
+        placeholders = ",".join("?" * len(app_ids))
+        rows = await db.execute_fetchall(
+            SELECT_INSTALLED_BY_IDS_SQL.format(placeholders=placeholders), app_ids
+        )
+
+        dirs_exist = await asyncio.gather(*(
+            asyncio.to_thread(app_dir_exists, row[6]) for row in rows
+        ))
+
+        for row, exists in zip(rows, dirs_exist):
+            if not exists:
+                continue
+
+            app_id, name, version, channel, architecture, install_date, app_dir = row
+            installed_apps[app_id] = {
+                'id': app_id,
+                'name': name,
+                'version': version,
+                'channel': channel,
+                'architecture': architecture,
+                'install_date': install_date,
+                'app_dir': app_dir
+            }
+
+        return installed_apps
+    except Exception as e:
+        logger.error(f"Error getting installed apps: {e}")
+        return {}
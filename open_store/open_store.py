@@ -1,13 +1,13 @@
 # SPDX-License-Identifier: GPL-2.0-only
 # Copyright (C) 2025 Bardia Moshiri <bardia@furilabs.com>
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 from time import time
-import tempfile
 import asyncio
 import aiohttp
 import shutil
-import json
 import sys
 import os
 
@@ -17,30 +17,42 @@ from dbus_fast import BusType, Variant
 
 from loguru import logger
 
-from common.utils import download_file
 from open_store.database import (
-    init_app_database, init_installed_database, save_app_list,
-    search_apps, save_installed_app, remove_installed_app,
-    get_installed_apps, get_installed_app
+    get_app_db, get_installed_db, close_db, open_readers, save_app_list,
+    search_apps, get_app, save_installed_app, remove_installed_app,
+    get_installed_apps, get_installed_app, get_installed_apps_by_ids, dump_json
 )
-from open_store.api import fetch_app_list, get_app_details
+from open_store.api import fetch_app_list, fetch_app_details, NOT_MODIFIED
 from open_store.apt import (
     is_package_installed, install_package, update_cache
 )
 from open_store.click import (
-    extract_click_package, get_system_architecture,
-    find_compatible_download,
+    extract_click_stream, get_system_architecture,
+    find_latest_download, add_revisions,
     process_desktop_files, cleanup_desktop_files
 )
 
 DATABASE = os.path.expanduser("~/.cache/store-provider/open-store/open-store.db")
 CACHE_DIR = os.path.expanduser("~/.cache/store-provider/open-store/repo")
-DOWNLOAD_DIR = os.path.expanduser("~/.cache/store-provider/open-store/downloads")
 INSTALLED_DB = os.path.expanduser("~/.local/store-provider/open-store/apps.db")
 APPS_DIR = os.path.expanduser("~/.local/store-provider/open-store")
 IDLE_TIMEOUT = 120
+# Number of app details requests GetUpgradable keeps in flight
+UPGRADE_CHECK_CONCURRENCY = 10
+# Number of packages UpgradePackages downloads at the same time
+INSTALL_CONCURRENCY = 3
+# Seconds app details are reused before they are revalidated with the API
+DETAILS_CACHE_TTL = 300
 OPENSTORE_API_URL = "https://open-store.io/api/v4/apps"
 
+# Constant values shared by every app in GetInstalledApps and GetUpgradable
+INSTALLED_STATE = Variant('s', 'installed')
+OPENSTORE_REPOSITORY = Variant('s', 'OpenStore')
+
+def str_variant(value):
+    """Wrap a string we stored or received ourselves, skipping signature verification"""
+    return Variant('s', value or '', False)
+
 class OpenStoreInterface(ServiceInterface):
     def __init__(self, idle_callback=None):
         logger.info("Initializing OpenStore service")
@@ -49,6 +61,11 @@ class OpenStoreInterface(ServiceInterface):
         self.db = None
         self.installed_db = None
 
+        # Read-only connections to the app database, used for searches; the
+        # installed apps live in their own small database behind installed_db
+        self._readers = asyncio.Queue()
+        self._reader_dbs = []
+
         # Get current system architecture
         self.system_arch = get_system_architecture()
         logger.info(f"Detected system architecture: {self.system_arch}")
@@ -56,35 +73,65 @@ class OpenStoreInterface(ServiceInterface):
         self.idle_callback = idle_callback
         self.idle_timer = None
 
-        # Task queue implementation
-        self._task_queue = asyncio.Queue()
-        self._task_processor = None
-        self._running = False
+        # Held while installing system dependencies and unpacking an app
+        self._install_lock = asyncio.Lock()
+
+        # Extraction threads block for as long as their download runs, so they
+        # get their own pool instead of tying up the default executor
+        self._extract_executor = ThreadPoolExecutor(
+            max_workers=INSTALL_CONCURRENCY, thread_name_prefix="click-extract"
+        )
+
+        # Whether the apps table holds a catalog, checked once at startup
+        self._apps_populated = False
+
+        # App details by package ID, as (fetch time, ETag, details)
+        self._details_cache = {}
 
-        # Start the task processor
-        self._start_task_processor()
+        # Held by methods that change the catalog or the installed apps;
+        # read-only methods run concurrently without it
+        self._write_lock = asyncio.Lock()
 
         # Start the idle timer
         self._reset_idle_timer()
 
     async def init_db(self):
-        os.makedirs(os.path.dirname(DATABASE), exist_ok=True)
-        os.makedirs(os.path.dirname(INSTALLED_DB), exist_ok=True)
-        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        self.db = await get_app_db(DATABASE)
+        self.installed_db = await get_installed_db(INSTALLED_DB)
 
-        self.db = await init_app_database(DATABASE)
-        self.installed_db = await init_installed_database(INSTALLED_DB)
+        self._reader_dbs = await open_readers(DATABASE)
+        for reader in self._reader_dbs:
+            self._readers.put_nowait(reader)
 
-        cursor = await self.db.execute("SELECT COUNT(*) FROM apps")
-        count = await cursor.fetchone()
-        if count[0] == 0:
+        rows = await self.db.execute_fetchall("SELECT EXISTS (SELECT 1 FROM apps)")
+        self._apps_populated = bool(rows[0][0])
+        if not self._apps_populated:
             logger.warning("Apps table is empty, fetching data from API")
             await self.fetch_all_apps()
 
+    @asynccontextmanager
+    async def _reader(self):
+        """Borrow a read-only app database connection"""
+        db = await self._readers.get()
+        try:
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
     async def ensure_session(self):
         """Ensure HTTP session exists"""
         if self.session is None:
-            self.session = aiohttp.ClientSession()
+            # Keep connections to open-store.io alive so concurrent and
+            # back-to-back requests reuse them instead of handshaking again
+            connector = aiohttp.TCPConnector(
+                limit=50,
+                limit_per_host=10,
+                ttl_dns_cache=600,
+                keepalive_timeout=60
+            )
+            # No total limit, click downloads can take a while on slow links
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
 
     async def cleanup_session(self):
         """Clean up HTTP session"""
@@ -92,80 +139,114 @@ class OpenStoreInterface(ServiceInterface):
             await self.session.close()
             self.session = None
 
-    def _start_task_processor(self):
-        """Start the async task processor if it's not already running"""
-        if not self._running:
-            self._running = True
-            self._task_processor = asyncio.create_task(self._process_task_queue())
-            logger.info("Task processor started")
-
-    def _reset_idle_timer(self):
-        """Reset the idle timer when activity occurs"""
+    def _reset_idle_timer(self, busy=0):
+        """Reset the idle timer when activity occurs, busy is +1/-1 when a call starts/ends"""
         if self.idle_callback:
-            asyncio.create_task(self.idle_callback())
-
-    async def _process_task_queue(self):
-        """Process tasks in queue one at a time"""
-        while self._running:
-            try:
-                # Get next task from queue
-                task, future = await self._task_queue.get()
-
-                # Reset idle timer on activity
-                self._reset_idle_timer()
-
-                try:
-                    # Execute the task
-                    result = await task()
-
-                    # Set the result for the waiting caller
-                    future.set_result(result)
-                except Exception as e:
-                    future.set_exception(e)
-                    logger.error(f"Task error: {e}")
-
-                # Mark task as done
-                self._task_queue.task_done()
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Task processor error: {e}")
-
-    async def _queue_task(self, task_func):
-        """Queue a task and wait for its result"""
-        future = asyncio.Future()
-        await self._task_queue.put((task_func, future))
+            self.idle_callback(busy)
 
-        # Reset idle timer on activity
-        self._reset_idle_timer()
+    async def _run(self, task_func):
+        """Run a read-only task right away"""
+        # Keep the service alive for as long as the call runs
+        self._reset_idle_timer(1)
+        try:
+            return await task_func()
+        finally:
+            self._reset_idle_timer(-1)
 
-        # Wait for the task to complete and return its result
-        return await future
+    async def _run_exclusive(self, task_func):
+        """Run a task that modifies state, one at a time"""
+        self._reset_idle_timer(1)
+        try:
+            async with self._write_lock:
+                return await task_func()
+        finally:
+            self._reset_idle_timer(-1)
 
     async def fetch_all_apps(self):
         """Fetch all apps from the OpenStore API"""
         await self.ensure_session()
         apps = await fetch_app_list(self.session)
 
-        if apps:
-            await save_app_list(self.db, apps)
+        if apps and await save_app_list(self.db, apps):
+            self._apps_populated = True
             return True
 
         return False
 
-    async def download_app(self, download_url, app_id, version, output_dir):
+    async def _ensure_apps(self):
+        """
+        Fetch the catalog if the apps table is empty.
+
+        Concurrent callers share a single fetch: whoever waited on the lock
+        finds the catalog populated and returns right away.
+
+        Returns:
+            True if the apps table holds a catalog, False otherwise
+        """
+        if self._apps_populated:
+            return True
+
+        async with self._write_lock:
+            if self._apps_populated:
+                return True
+
+            logger.warning("No apps in database, fetching first")
+            return await self.fetch_all_apps()
+
+    async def _cached_details(self, package_id):
+        """
+        Get the details of an app, reusing a recent response.
+
+        Args:
+            package_id: App ID
+
+        Returns:
+            App details or None if not found
+        """
+        cached = self._details_cache.get(package_id)
+        if cached and time() - cached[0] < DETAILS_CACHE_TTL:
+            return cached[2]
+
         await self.ensure_session()
+        etag = cached[1] if cached else None
+        details, etag = await fetch_app_details(self.session, package_id, etag)
 
-        try:
-            click_filename = f"{app_id}-{version}.click"
-            output_path = os.path.join(output_dir, click_filename)
+        if details is NOT_MODIFIED:
+            details = cached[2]
+        elif details is None:
+            self._details_cache.pop(package_id, None)
+            return None
+        else:
+            # Parsed once here rather than on every comparison of every check
+            add_revisions(details.get('downloads', []))
 
-            success = await download_file(self.session, download_url, output_path)
+        self._details_cache[package_id] = (time(), etag, details)
+        return details
 
-            if success:
-                return output_path
-            else:
-                return None
+    async def download_and_extract(self, download_url, app_id, target_dir):
+        """
+        Download a click package and extract it as the bytes arrive.
+
+        Args:
+            download_url: URL of the .click file
+            app_id: App ID
+            target_dir: Directory to extract contents to
+
+        Returns:
+            Path to the extracted directory or None if the download or extraction failed
+        """
+        await self.ensure_session()
+
+        try:
+            async with self.session.get(download_url) as response:
+                if response.status != 200:
+                    logger.error(f"Error downloading app: HTTP {response.status}")
+                    return None
+
+                return await extract_click_stream(
+                    response.content.iter_chunked(65536), target_dir,
+                    f"{app_id} from {download_url}", self._extract_executor
+                )
         except Exception as e:
             logger.error(f"Error downloading app: {e}")
             return None
@@ -175,17 +256,26 @@ class OpenStoreInterface(ServiceInterface):
         async def _search_task():
             logger.info(f"Searching for {query}")
 
-            cursor = await self.db.execute("SELECT COUNT(*) FROM apps")
-            count = await cursor.fetchone()
-            if count[0] == 0:
-                logger.warning("No apps in database, fetching first")
-                await self.fetch_all_apps()
+            await self._ensure_apps()
+
+            async with self._reader() as db:
+                results = await search_apps(db, query)
+
+            return dump_json(results)
+
+        return await self._run(_search_task)
+
+    @method()
+    async def GetApp(self, package_id: 's') -> 's':
+        async def _get_app_task():
+            logger.info(f"Getting app {package_id}")
 
-            results = await search_apps(self.db, query)
+            async with self._reader() as db:
+                app = await get_app(db, package_id)
 
-            return json.dumps(results)
+            return dump_json(app or {})
 
-        return await self._queue_task(_search_task)
+        return await self._run(_get_app_task)
 
     @method()
     async def GetRepositories(self) -> 'a(ss)':
@@ -194,7 +284,7 @@ class OpenStoreInterface(ServiceInterface):
             # For now, just return OpenStore as the only repository
             return [["OpenStore", "https://open-store.io"]]
 
-        return await self._queue_task(_get_repositories_task)
+        return await self._run(_get_repositories_task)
 
     @method()
     async def UpdateCache(self) -> 'b':
@@ -207,205 +297,294 @@ class OpenStoreInterface(ServiceInterface):
                 logger.error(f"Error updating cache: {e}")
                 return False
 
-        return await self._queue_task(_update_cache_task)
+        return await self._run_exclusive(_update_cache_task)
 
-    @method()
-    async def Install(self, package_id: 's') -> 'b':
-        async def _install_task():
-            logger.info(f"Installing package {package_id}")
+    async def _install(self, package_id, installed=None):
+        """
+        Download and install an app.
 
-            await self.ensure_session()
-            app_details = await get_app_details(self.session, package_id)
+        Called from the Install and UpgradePackages tasks, which already hold
+        the write lock.
 
-            if not app_details:
-                logger.error(f"Could not get app details for {package_id}")
-                return False
+        Args:
+            package_id: App ID
+            installed: Installed apps by ID, already looked up by the caller.
+                If None, the existing installation is looked up here.
 
-            downloads = app_details.get('downloads', [])
-            if not downloads:
-                logger.error(f"No downloads available for {package_id}")
-                return False
+        Returns:
+            True if successful, False otherwise
+        """
+        logger.info(f"Installing package {package_id}")
 
-            compatible_download = find_compatible_download(downloads, self.system_arch)
-            if not compatible_download:
-                logger.error(f"No compatible download found for {package_id} on {self.system_arch}")
-                return False
-
-            download_url = compatible_download.get('download_url')
-            version = compatible_download.get('version', '0.0.0')
-            arch = compatible_download.get('architecture')
-            channel = compatible_download.get('channel')
-
-            if not download_url:
-                logger.error(f"No download URL for {package_id}")
-                return False
+        await self.ensure_session()
+        app_details = await self._cached_details(package_id)
+
+        if not app_details:
+            logger.error(f"Could not get app details for {package_id}")
+            return False
+
+        downloads = app_details.get('downloads', [])
+        if not downloads:
+            logger.error(f"No downloads available for {package_id}")
+            return False
+
+        # Fresh installs have no channel yet: the newest focal build, else the newest build
+        compatible_download = find_latest_download(downloads, self.system_arch, 'focal')
+        if not compatible_download:
+            logger.error(f"No compatible download found for {package_id} on {self.system_arch}")
+            return False
+
+        download_url = compatible_download.get('download_url')
+        version = compatible_download.get('version', '0.0.0')
+        arch = compatible_download.get('architecture')
+        channel = compatible_download.get('channel')
+
+        if not download_url:
+            logger.error(f"No download URL for {package_id}")
+            return False
+
+        # Check for an existing installation
+        if installed is None:
+            old_app = await get_installed_app(self.installed_db, package_id)
+        else:
+            old_app = installed.get(package_id)
+
+        if (old_app and old_app['version'] == version and
+            old_app['channel'] == channel and old_app['architecture'] == arch):
+            logger.info(f"{package_id} version {version} for {arch} is already installed, skipping")
+            return True
 
+        async with self._install_lock:
             if not is_package_installed("furios-lomiri-app-support"):
                 await update_cache()
                 await install_package("furios-lomiri-app-support")
             else:
                 logger.info("Lomiri app support is already installed. skipping")
 
-            # Create a temporary directory for downloading the click package
-            with tempfile.TemporaryDirectory() as temp_download_dir:
-                logger.info(f"Downloading {download_url} for architecture {arch}")
-                click_path = await self.download_app(download_url, package_id, version, temp_download_dir)
+        # Unpack next to the final location while downloading, so the old
+        # version stays in place until the new one is complete
+        app_dir = os.path.join(APPS_DIR, package_id)
+        staging_dir = os.path.join(APPS_DIR, f".{package_id}.new")
+        await asyncio.to_thread(shutil.rmtree, staging_dir, ignore_errors=True)
 
-                if not click_path:
-                    logger.error(f"Failed to download {package_id}")
-                    return False
+        logger.info(f"Downloading {download_url} for architecture {arch}")
+        extracted_dir = await self.download_and_extract(download_url, package_id, staging_dir)
 
-                try:
-                    # Check for existing installation and clean up
-                    old_app = await get_installed_app(self.installed_db, package_id)
+        if not extracted_dir:
+            logger.error(f"Failed to download and extract {package_id}")
+            await asyncio.to_thread(shutil.rmtree, staging_dir, ignore_errors=True)
+            return False
 
-                    if old_app:
-                        old_app_dir = old_app['app_dir']
-
-                        await cleanup_desktop_files(package_id)
-
-                        # Remove old app directory
-                        if old_app_dir and os.path.exists(old_app_dir):
-                            try:
-                                shutil.rmtree(old_app_dir)
-                                logger.info(f"Removed old app directory: {old_app_dir}")
-                            except Exception as e:
-                                logger.error(f"Error removing old app directory: {e}")
-                except Exception as e:
-                    logger.error(f"Error checking for old version: {e}")
+        # Downloads run in parallel, unpacking and bookkeeping one app at a time
+        async with self._install_lock:
+            try:
+                # Clean up the existing installation
+                if old_app:
+                    old_app_dir = old_app['app_dir']
+
+                    await cleanup_desktop_files(package_id)
+
+                    # Remove old app directory
+                    if old_app_dir and await asyncio.to_thread(os.path.exists, old_app_dir):
+                        try:
+                            # Off the event loop, an app can have thousands of files
+                            await asyncio.to_thread(shutil.rmtree, old_app_dir)
+                            logger.info(f"Removed old app directory: {old_app_dir}")
+                        except Exception as e:
+                            logger.error(f"Error removing old app directory: {e}")
+            except Exception as e:
+                logger.error(f"Error checking for old version: {e}")
 
-                app_dir = os.path.join(APPS_DIR, package_id)
-                os.makedirs(app_dir, exist_ok=True)
+            try:
+                # Leftovers of an install the database does not know about
+                if await asyncio.to_thread(os.path.exists, app_dir):
+                    await asyncio.to_thread(shutil.rmtree, app_dir)
+                await asyncio.to_thread(os.rename, staging_dir, app_dir)
+            except OSError as e:
+                logger.error(f"Error moving {package_id} into place: {e}")
+                await asyncio.to_thread(shutil.rmtree, staging_dir, ignore_errors=True)
+                return False
 
-                # Extract the click package
-                extracted_dir = await extract_click_package(click_path, app_dir)
-                if not extracted_dir:
-                    logger.error(f"Failed to extract {package_id}")
-                    return False
+            # Process desktop files
+            desktop_files = await process_desktop_files(package_id, app_dir)
+            logger.info(f"Processed {len(desktop_files)} desktop files for {package_id}")
+
+            # The next upgrade check should see what is now installed
+            self._details_cache.pop(package_id, None)
+
+            # Save app info to database (without click_path)
+            current_time = time()
+            success = await save_installed_app(
+                self.installed_db,
+                package_id,
+                app_details.get('name', ''),
+                version,
+                channel,
+                arch,
+                current_time,
+                app_dir
+            )
 
-                # Process desktop files
-                desktop_files = await process_desktop_files(package_id, app_dir)
-                logger.info(f"Processed {len(desktop_files)} desktop files for {package_id}")
-
-                # Save app info to database (without click_path)
-                current_time = time()
-                success = await save_installed_app(
-                    self.installed_db,
-                    package_id,
-                    app_details.get('name', ''),
-                    version,
-                    channel,
-                    arch,
-                    current_time,
-                    app_dir
-                )
+            if success:
+                # Marshalled on the next loop iteration, after the install lock is released
+                asyncio.get_running_loop().call_soon(self.AppInstalled, package_id)
+                logger.success(f"Successfully installed {package_id} version {version} for {arch}")
+                return True
+            else:
+                logger.error("Error saving installation details")
+                return False
 
-                if success:
-                    self.AppInstalled(package_id)
-                    logger.success(f"Successfully installed {package_id} version {version} for {arch}")
-                    return True
-                else:
-                    logger.error("Error saving installation details")
-                    return False
+    @method()
+    async def Install(self, package_id: 's') -> 'b':
+        async def _install_task():
+            return await self._install(package_id)
 
-        return await self._queue_task(_install_task)
+        return await self._run_exclusive(_install_task)
 
     @signal()
     def AppInstalled(self, package_id: 's') -> 's':
         return package_id
 
-    @method()
-    async def GetUpgradable(self) -> 'aa{sv}':
-        async def _get_upgradable_task():
-            logger.info("Getting upgradable apps")
-            upgradable = []
+    async def _check_upgrade(self, app):
+        """
+        Check whether a newer build of an installed app is available.
 
-            try:
+        Args:
+            app: Installed app information
+
+        Returns:
+            Upgrade information or None if the app is up to date
+        """
+        app_id = app['id']
+        app_name = app['name']
+        current_version = app['version']
+        channel = app['channel']
+        architecture = app['architecture']
+
+        app_details = await self._cached_details(app_id)
+        if not app_details:
+            return None
+
+        latest_download = find_latest_download(
+            app_details.get('downloads', []), architecture, channel
+        )
+        if not latest_download:
+            return None
+
+        latest_version = latest_download.get('version', '0.0.0')
+        if latest_version == current_version:
+            return None
+
+        logger.info(f"Upgradable: {app_id} from {current_version} to {latest_version}")
+        app_id_variant = str_variant(app_id)
+        return {
+            'id': app_id_variant,
+            'name': str_variant(app_name),
+            'packageName': app_id_variant,
+            'currentVersion': str_variant(current_version),
+            'availableVersion': str_variant(latest_version),
+            'architecture': str_variant(architecture),
+            'repository': OPENSTORE_REPOSITORY,
+            'download_url': str_variant(latest_download.get('download_url', '')),
+            'channel': str_variant(latest_download.get('channel', ''))
+        }
+
+    async def _get_upgradable(self, installed_apps=None):
+        """
+        Find installed apps with a newer build available.
+
+        Args:
+            installed_apps: Installed apps, already read by the caller.
+                If None, they are read from the database here.
+
+        Returns:
+            List of upgrade information dictionaries
+        """
+        logger.info("Getting upgradable apps")
+        upgradable = []
+
+        try:
+            if installed_apps is None:
                 installed_apps = await get_installed_apps(self.installed_db)
-                await self.ensure_session()
+            await self.ensure_session()
 
-                for app in installed_apps:
-                    app_id = app['id']
-                    app_name = app['name']
-                    current_version = app['version']
-                    channel = app['channel']
-                    architecture = app['architecture']
-
-                    app_details = await get_app_details(self.session, app_id)
-                    if not app_details:
-                        continue
-
-                    downloads = app_details.get('downloads', [])
-                    compatible_downloads = [d for d in downloads if
-                                            d.get('architecture') == architecture or
-                                            d.get('architecture') == 'all']
-
-                    if not compatible_downloads:
-                        continue
-
-                    latest_version = None
-                    latest_download = None
-
-                    channel_downloads = [d for d in compatible_downloads if d.get('channel') == channel]
-                    if channel_downloads:
-                        latest_download = max(channel_downloads, key=lambda x: int(x.get('revision', 0)))
-                        latest_version = latest_download.get('version', '0.0.0')
-                    else:
-                        # If no match by channel, try focal
-                        focal_downloads = [d for d in compatible_downloads if d.get('channel') == 'focal']
-                        if focal_downloads:
-                            latest_download = max(focal_downloads, key=lambda x: int(x.get('revision', 0)))
-                            latest_version = latest_download.get('version', '0.0.0')
-                        # If no focal either, just get the latest revision
-                        else:
-                            latest_download = max(compatible_downloads, key=lambda x: int(x.get('revision', 0)))
-                            latest_version = latest_download.get('version', '0.0.0')
-
-                    if latest_version != current_version:
-                        app_info = {
-                            'id': Variant('s', app_id),
-                            'name': Variant('s', app_name),
-                            'packageName': Variant('s', app_id),
-                            'currentVersion': Variant('s', current_version),
-                            'availableVersion': Variant('s', latest_version),
-                            'architecture': Variant('s', architecture),
-                            'repository': Variant('s', 'OpenStore'),
-                            'download_url': Variant('s', latest_download.get('download_url', '')),
-                            'channel': Variant('s', latest_download.get('channel', ''))
-                        }
-                        upgradable.append(app_info)
-                        logger.info(f"Upgradable: {app_id} from {current_version} to {latest_version}")
-
-                return upgradable
-            except Exception as e:
-                logger.error(f"Error getting upgradable apps: {e}")
-                return []
+            # Fetch the details of several apps at once instead of one by one
+            semaphore = asyncio.Semaphore(UPGRADE_CHECK_CONCURRENCY)
+
+            async def _check_limited(app):
+                async with semaphore:
+                    return await self._check_upgrade(app)
 
-        return await self._queue_task(_get_upgradable_task)
+            results = await asyncio.gather(
+                *(_check_limited(app) for app in installed_apps),
+                return_exceptions=True
+            )
+
+            for app, result in zip(installed_apps, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error checking {app['id']} for upgrades: {result}")
+                elif result:
+                    upgradable.append(result)
+
+            return upgradable
+        except Exception as e:
+            logger.error(f"Error getting upgradable apps: {e}")
+            return []
+
+    @method()
+    async def GetUpgradable(self) -> 'aa{sv}':
+        async def _get_upgradable_task():
+            return await self._get_upgradable()
+
+        return await self._run(_get_upgradable_task)
 
     @method()
     async def UpgradePackages(self, packages: 'as') -> 'b':
         async def _upgrade_packages_task():
             logger.info(f"Upgrading packages {packages}")
 
+            # Look up all existing installations at once rather than per package
             upgrade_list = packages
-            if not upgrade_list:
-                upgradable = await self.GetUpgradable()
+            if upgrade_list:
+                installed = await get_installed_apps_by_ids(self.installed_db, upgrade_list)
+            else:
+                installed_apps = await get_installed_apps(self.installed_db)
+                installed = {app['id']: app for app in installed_apps}
+                upgradable = await self._get_upgradable(installed_apps)
                 upgrade_list = [app['id'].value for app in upgradable]
 
+            # Two installs of the same app would share its staging directory
+            upgrade_list = list(dict.fromkeys(upgrade_list))
+
             if not upgrade_list:
                 logger.info("No packages to upgrade")
                 return True
 
             logger.info(f"Upgrading packages: {', '.join(upgrade_list)}")
 
+            # Download several packages at once, _install serializes the unpacking
+            semaphore = asyncio.Semaphore(INSTALL_CONCURRENCY)
+
+            async def _install_limited(package_id):
+                async with semaphore:
+                    return await self._install(package_id, installed)
+
+            results = await asyncio.gather(
+                *(_install_limited(package_id) for package_id in upgrade_list),
+                return_exceptions=True
+            )
+
             success = True
-            for package_id in upgrade_list:
-                if not await self.Install(package_id):
+            for package_id, result in zip(upgrade_list, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to upgrade {package_id}: {result}")
+                    success = False
+                elif not result:
                     logger.error(f"Failed to upgrade {package_id}")
                     success = False
+
             return success
-        return await self._queue_task(_upgrade_packages_task)
+        return await self._run_exclusive(_upgrade_packages_task)
 
     @method()
     async def GetInstalledApps(self) -> 'aa{sv}':
@@ -414,17 +593,19 @@ class OpenStoreInterface(ServiceInterface):
             result = []
 
             try:
+                # The reader pool only covers the app catalog, not installed_db
                 installed_apps = await get_installed_apps(self.installed_db)
                 for app in installed_apps:
+                    app_id = str_variant(app['id'])
                     app_info = {
-                        'id': Variant('s', app['id']),
-                        'packageName': Variant('s', app['id']),
-                        'name': Variant('s', app['name']),
-                        'versionName': Variant('s', app['version']),
-                        'channel': Variant('s', app['channel']),
-                        'architecture': Variant('s', app['architecture']),
-                        'installDate': Variant('d', float(app['install_date'])),
-                        'state': Variant('s', 'installed')
+                        'id': app_id,
+                        'packageName': app_id,
+                        'name': str_variant(app['name']),
+                        'versionName': str_variant(app['version']),
+                        'channel': str_variant(app['channel']),
+                        'architecture': str_variant(app['architecture']),
+                        'installDate': Variant('d', float(app['install_date']), False),
+                        'state': INSTALLED_STATE
                     }
                     result.append(app_info)
 
@@ -433,7 +614,7 @@ class OpenStoreInterface(ServiceInterface):
                 logger.error(f"Error getting installed apps: {e}")
                 return []
 
-        return await self._queue_task(_get_installed_apps_task)
+        return await self._run(_get_installed_apps_task)
 
     @method()
     async def UninstallApp(self, package_name: 's') -> 'b':
@@ -447,12 +628,13 @@ class OpenStoreInterface(ServiceInterface):
                     return False
 
                 app_dir = app['app_dir']
+                self._details_cache.pop(package_name, None)
                 await cleanup_desktop_files(package_name)
                 await remove_installed_app(self.installed_db, package_name)
 
-                if app_dir and os.path.exists(app_dir):
+                if app_dir and await asyncio.to_thread(os.path.exists, app_dir):
                     try:
-                        shutil.rmtree(app_dir)
+                        await asyncio.to_thread(shutil.rmtree, app_dir)
                         logger.info(f"Removed app directory: {app_dir}")
                     except Exception as e:
                         logger.error(f"Error removing app directory: {e}")
@@ -463,24 +645,23 @@ class OpenStoreInterface(ServiceInterface):
                 logger.error(f"Error uninstalling app: {e}")
                 return False
 
-        return await self._queue_task(_uninstall_app_task)
+        return await self._run_exclusive(_uninstall_app_task)
 
     async def cleanup(self):
         """Clean up resources when service is stopping"""
-        self._running = False
         if self.idle_timer:
             self.idle_timer.cancel()
-        if self._task_processor:
-            self._task_processor.cancel()
-            try:
-                await self._task_processor
-            except asyncio.CancelledError:
-                pass
         await self.cleanup_session()
+        self._extract_executor.shutdown(wait=False, cancel_futures=True)
+        for reader in self._reader_dbs:
+            await reader.close()
+        self._reader_dbs = []
         if self.db:
-            await self.db.close()
+            await close_db(DATABASE)
+            self.db = None
         if hasattr(self, 'installed_db') and self.installed_db:
-            await self.installed_db.close()
+            await close_db(INSTALLED_DB)
+            self.installed_db = None
 
 class OpenStoreService:
     def __init__(self, idle_callback=None):
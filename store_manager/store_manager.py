@@ -34,22 +34,32 @@ class StoreManager:
         self.shutdown_event = asyncio.Event()
         self.idle_timer = None
         self.idle_timeout = 120  # seconds
+        self._last_activity = 0.0
+        self._busy = 0  # D-Bus calls currently running
         self.store_manager_bus = None
         self._tasks = []
 
-    async def reset_idle_timer(self):
-        if self.idle_timer:
-            self.idle_timer.cancel()
-        self.idle_timer = asyncio.create_task(self._idle_countdown())
-        self._tasks.append(self.idle_timer)
-
-    async def _idle_countdown(self):
-        try:
-            await asyncio.sleep(self.idle_timeout)
+    def reset_idle_timer(self, busy=0):
+        # Only note the time, the single pending timer checks it when it fires.
+        # busy is +1 when a call starts and -1 when it ends.
+        loop = asyncio.get_running_loop()
+        self._busy += busy
+        self._last_activity = loop.time()
+        if self.idle_timer is None:
+            self.idle_timer = loop.call_later(self.idle_timeout, self._check_idle)
+
+    def _check_idle(self):
+        loop = asyncio.get_running_loop()
+        idle = loop.time() - self._last_activity
+        if self._busy > 0:
+            # Never shut down under a running call, however long it takes
+            self.idle_timer = loop.call_later(self.idle_timeout, self._check_idle)
+        elif idle >= self.idle_timeout:
+            self.idle_timer = None
             logger.info(f"Services idle for {self.idle_timeout} seconds, shutting down")
             self.shutdown_event.set()
-        except asyncio.CancelledError:
-            pass
+        else:
+            self.idle_timer = loop.call_later(self.idle_timeout - idle, self._check_idle)
 
     async def setup_store_manager_interface(self):
         self.store_manager_bus = await MessageBus(bus_type=BusType.SESSION).connect()
@@ -63,17 +73,18 @@ class StoreManager:
             self.android_store = AndroidStoreService(idle_callback=self.reset_idle_timer)
             self.open_store = OpenStoreService(idle_callback=self.reset_idle_timer)
 
+            self.reset_idle_timer()
+
             setup_tasks = [
                 self.setup_store_manager_interface(),
-                self.reset_idle_timer(),
                 self.android_store.setup(),
                 self.open_store.setup()
             ]
 
             results = await asyncio.gather(*setup_tasks)
 
-            android_bus = results[2]
-            openstore_bus = results[3]
+            android_bus = results[1]
+            openstore_bus = results[2]
 
             android_disconnect = asyncio.create_task(android_bus.wait_for_disconnect())
             openstore_disconnect = asyncio.create_task(openstore_bus.wait_for_disconnect())
@@ -126,7 +137,7 @@ class StoreManager:
             cleanup_tasks.append(self.open_store.cleanup())
         if cleanup_tasks:
             await asyncio.gather(*cleanup_tasks, return_exceptions=True)
-        if self.idle_timer and not self.idle_timer.done():
+        if self.idle_timer:
             self.idle_timer.cancel()
 
         self.android_store = None